@@ -15,55 +15,172 @@ This script uses an Excel file report which queries all active participants with
 10. Geocoding Status
 11. Last Updated Timestamp
 
-It uses the Nominatim geocoding service for address lookup and various APIs for district look
+It uses the Nominatim geocoding service for address lookup, the Census geocoder for Census
+geographies, and district boundary layers (ArcGIS, Census TIGER/Line) for district lookup
 """
 
-import pandas as pd # type: ignore
-import requests # type: ignore
-import json
+import asyncio
+import csv
+import functools
+import hashlib
 import time
+import io
+import pandas as pd # type: ignore
+import geopandas as gpd # type: ignore
+import pyarrow as pa # type: ignore
+import pyarrow.parquet as pq # type: ignore
+import httpx # type: ignore
+import orjson # type: ignore
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter # type: ignore
+from aiolimiter import AsyncLimiter # type: ignore
+import diskcache # type: ignore
 from geopy.geocoders import Nominatim # type: ignore
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError # type: ignore
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import os
+import shutil
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def format_address(address, city, zip_code):
+    """Build the full address string sent to the geocoders."""
+    return f"{address}, {city}, CA {zip_code}"
+
+def census_cache_key(key):
+    """Cache key for the Census batch result of an (address, city, zip) key."""
+    return ('census', format_address(*key).strip().lower())
+
+def file_fingerprint(path):
+    """Hash a file's contents so a checkpoint can be matched to its input."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_transient_error(error):
+    """Check whether a failed request is worth retrying."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+# Longest wait between retries, whether from backoff or a Retry-After header
+RETRY_MAX_WAIT = 30  # seconds
+
+def retry_after_seconds(response, default=1):
+    """Read the Retry-After header, which may be seconds or an HTTP date."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return default
+    
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return default
+    
+    return min(max(0, seconds), RETRY_MAX_WAIT)
+
 class DistrictLookup:
-    def __init__(self, excel_file_path):
+    # Normalized names of the Marin cities to look up supervisor districts for
+    MARIN_CITIES = frozenset({
+        'san rafael', 'novato', 'mill valley', 'tiburon', 'sausalito', 'corte madera',
+        'larkspur', 'fairfax', 'san anselmo', 'ross', 'kentfield', 'belvedere'
+    })
+    
+    # Columns added for new geo data
+    GEO_COLUMNS = [
+        'Latitude', 'Longitude', 'Geocoded_Address',
+        'SF_Supervisorial_District',
+        'Marin_Supervisor_District',
+        'Congressional_District',
+        'Census_PUMA', 'Census_Tract', 'Census_Block',
+        'CA_Assembly_District',
+        'CA_Senate_District',
+        'Geocoding_Status', 'Last_Updated'
+    ]
+    
+    # Columns filled by district and Census lookups, which write 'Error' on failure
+    LOOKUP_COLUMNS = [
+        'SF_Supervisorial_District', 'Marin_Supervisor_District',
+        'Congressional_District', 'Census_PUMA', 'Census_Tract', 'Census_Block',
+        'CA_Assembly_District', 'CA_Senate_District'
+    ]
+    
+    # Geo columns checkpointed as text; the rest are coordinates and the timestamp
+    TEXT_COLUMNS = [col for col in GEO_COLUMNS if col not in ('Latitude', 'Longitude', 'Last_Updated')]
+    
+    # Plausible California coordinates; anything outside is a bad geocode
+    CA_LAT_RANGE = (32, 42)
+    CA_LON_RANGE = (-125, -114)
+    
+    def __init__(self, excel_file_path, max_concurrency=20, cache_dir="./.gdap_cache", chunk_size=500):
         self.excel_file_path = excel_file_path
+        self.checkpoint_path = f"{os.path.splitext(excel_file_path)[0]}_checkpoint.parquet"
+        # Written beside the parts; the leading underscore keeps pyarrow from reading it as data
+        self.fingerprint_path = os.path.join(self.checkpoint_path, '_fingerprint')
+        self.fingerprint = None  # sha256 of the input file, set in load_data
         self.df = None
         self.geolocator = Nominatim(user_agent="district_lookup_v1.0")
-        self.session = requests.Session()
+        self.client = None  # httpx client, opened in process_records
+        
+        # District layers, downloaded in process_records
+        self.sf_districts = None
+        self.marin_districts = None
+        self.congressional_districts = None
+        self.assembly_districts = None
+        self.senate_districts = None
+        
+        # Geocodes and district responses persist across runs
+        self.cache = diskcache.Cache(cache_dir)
+        self.cache_expire = 30 * 86400  # seconds
         
         # Limit Rate of API calls 
         self.geocode_delay = 1.1  # Nominatim use policy: 1 second between requests 
-        self.api_delay = 0.5
+        # One token bucket shared by every geocoding task, however many are in flight
+        self._nominatim_limiter = AsyncLimiter(max_rate=1, time_period=self.geocode_delay)
+        self.api_limiter = AsyncLimiter(10, 1)
+        
+        # Records in flight at once
+        self.max_concurrency = max_concurrency
+        self.record_semaphore = None
+        self.processed = 0
+        
+        # Per-row results, written to the DataFrame in blocks
+        self.results = []
+        
+        # Addresses already sent to the Census batch geocoder this run
+        self.census_batched = set()
+        # Normalized Census cache key for each remaining address, built once per run
+        self.census_keys = {}
+        
+        # Records are processed and checkpointed chunk_size at a time
+        self.chunk_size = chunk_size
+        self.completed = pd.Index([])
         
     def load_data(self):
         """Load Excel file into DataFrame."""
         try:
-            self.df = pd.read_excel(self.excel_file_path)
+            self.df = pd.read_excel(self.excel_file_path, engine='calamine')
+            self.fingerprint = file_fingerprint(self.excel_file_path)
             logger.info(f"Loaded {len(self.df)} records from {self.excel_file_path}")
             
             # Add columns for new geo data
-            new_columns = [
-                'Latitude', 'Longitude', 'Geocoded_Address',
-                'SF_Supervisorial_District',
-                'Marin_Supervisor_District',
-                'Congressional_District',
-                'Census_PUMA', 'Census_Tract', 'Census_Block',
-                'CA_Assembly_District',
-                'CA_Senate_District',
-                'Geocoding_Status', 'Last_Updated'
-            ]
+            self.df = self.df.reindex(
+                columns=self.df.columns.tolist() + [col for col in self.GEO_COLUMNS if col not in self.df.columns]
+            )
             
-            for col in new_columns:
-                if col not in self.df.columns:
-                    self.df[col] = None
+            # Empty columns read back from Excel as float, but results are mostly text
+            text_columns = [col for col in self.GEO_COLUMNS if col not in ('Latitude', 'Longitude')]
+            self.df[text_columns] = self.df[text_columns].astype(object)
+            
+            self.load_progress()
                     
             return True
             
@@ -71,25 +188,35 @@ class DistrictLookup:
             logger.error(f"Error loading Excel: {e}")
             return False
     
-    def geocode_address(self, address, city, zip_code):
+    async def geocode_address(self, address, city, zip_code):
         """Geocode to get latlon coordinates."""
+        # Build full address
+        full_address = format_address(address, city, zip_code)
+        
+        cache_key = ('geocode', full_address.strip().lower())
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Build full address
-            full_address = f"{address}, {city}, CA {zip_code}"
-            
-            time.sleep(self.geocode_delay)
-            
-            location = self.geolocator.geocode(full_address, timeout=10)
+            async with self._nominatim_limiter:
+                loop = asyncio.get_running_loop()
+                location = await loop.run_in_executor(
+                    None, functools.partial(self.geolocator.geocode, full_address, timeout=10)
+                )
             
             if location:
-                return {
+                result = {
                     'latitude': location.latitude,
                     'longitude': location.longitude,
                     'formatted_address': location.address,
                     'status': 'Success'
                 }
             else:
-                return {'status': 'Not Found'}
+                result = {'status': 'Not Found'}
+            
+            self.cache.set(cache_key, result, expire=self.cache_expire)
+            return result
                 
         except (GeocoderTimedOut, GeocoderServiceError) as e:
             logger.warning(f"Geocoding error for {full_address}: {e}")
@@ -98,83 +225,143 @@ class DistrictLookup:
             logger.error(f"Unexpected geocoding error: {e}")
             return {'status': f'Unexpected Error: {str(e)}'}
     
-    def get_sf_supervisorial_district(self, lat, lon):
-        """Get SF Supervisorial District."""
-        try:
-            time.sleep(self.api_delay)
-            
-            url = "https://services3.arcgis.com/iOy5B2EVhg9OAGCE/arcgis/rest/services/Supervisor_Districts/FeatureServer/0/query"
-            
-            params = {
-                'where': '1=1',
-                'geometry': f'{lon},{lat}',
-                'geometryType': 'esriGeometryPoint',
-                'spatialRel': 'esriSpatialRelWithin',
-                'outFields': '*',
-                'returnGeometry': 'false',
-                'f': 'json'
-            }
-            
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'features' in data and data['features']:
-                feature = data['features'][0]
-                attributes = feature['attributes']
-                
-                return {
-                    'district': attributes.get('DISTRICT', 'Unknown'),
-                }
-            
-            return {'district': None}
-            
-        except Exception as e:
-            logger.warning(f"SF District lookup error: {e}")
-            return {'district': 'Error'}
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential_jitter(initial=1, max=RETRY_MAX_WAIT),
+        retry=retry_if_exception(is_transient_error),
+        reraise=True
+    )
+    async def _request(self, method, url, **kwargs):
+        """Send a request, retrying rate limits, server errors, and network failures."""
+        response = await self.client.request(method, url, **kwargs)
+        
+        # Wait as long as the server asks before the backoff kicks in
+        if response.status_code == 429:
+            await asyncio.sleep(retry_after_seconds(response))
+        
+        response.raise_for_status()
+        return response
     
-    def get_marin_supervisor_district(self, lat, lon):
-        """Get Marin County Supervisor District."""
-        try:
-            time.sleep(self.api_delay)
-            
-            # Marin County GIS services
-            url = "https://gis.marincounty.org/server/rest/services/Boundaries/Supervisor_Districts/MapServer/0/query"
-            
-            params = {
-                'where': '1=1',
-                'geometry': f'{lon},{lat}',
-                'geometryType': 'esriGeometryPoint',
-                'spatialRel': 'esriSpatialRelWithin',
-                'outFields': '*',
-                'returnGeometry': 'false',
-                'f': 'json'
-            }
-            
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'features' in data and data['features']:
-                feature = data['features'][0]
-                attributes = feature['attributes']
-                
-                return {
-                    'district': attributes.get('DISTRICT', 'Unknown'),
-                }
-            return {'district': None}
+    async def _get_json(self, url, params, timeout=15):
+        """GET a JSON response, served from the disk cache when possible."""
+        cache_key = (url, tuple(sorted(params.items())))
+        data = self.cache.get(cache_key)
+        if data is not None:
+            return data
+        
+        async with self.api_limiter:
+            response = await self._request('GET', url, params=params, timeout=timeout)
+            data = orjson.loads(response.content)
+        
+        # ArcGIS reports errors with a 200 status
+        if 'error' not in data:
+            self.cache.set(cache_key, data, expire=self.cache_expire)
+        return data
+    
+    async def get_district_layer(self, url):
+        """Download an ArcGIS district layer as a GeoDataFrame."""
+        params = {
+            'where': '1=1',
+            'outFields': '*',
+            'outSR': '4326',
+            'f': 'geojson'
+        }
+        
+        data = await self._get_json(url, params, timeout=60)
+        
+        layer = gpd.GeoDataFrame.from_features(data['features'], crs='EPSG:4326')
+        
+        # Build the spatial index up front rather than on the first lookup
+        layer.sindex
+        return layer
+    
+    async def get_tiger_layer(self, url, field):
+        """Download a TIGER/Line shapefile as a district layer."""
+        cache_key = ('tiger', url)
+        content = self.cache.get(cache_key)
+        if content is None:
+            response = await self._request('GET', url, timeout=300)
+            content = response.content
+            self.cache.set(cache_key, content, expire=365 * 86400)
+        
+        # Parsing a shapefile takes a while, so keep it off the event loop
+        layer = await asyncio.to_thread(gpd.read_file, io.BytesIO(content))
+        layer = layer.to_crs('EPSG:4326')[[field, 'geometry']].rename(columns={field: 'DISTRICT'})
+        
+        layer.sindex
+        return layer
+    
+    async def load_district_layers(self):
+        """Load the Supervisor, Congressional, Assembly, and Senate District layers."""
+        sf_url = "https://services3.arcgis.com/iOy5B2EVhg9OAGCE/arcgis/rest/services/Supervisor_Districts/FeatureServer/0/query"
+        
+        # Marin County GIS services
+        marin_url = "https://gis.marincounty.org/server/rest/services/Boundaries/Supervisor_Districts/MapServer/0/query"
+        
+        # Census TIGER/Line shapefiles for California
+        congressional_url = "https://www2.census.gov/geo/tiger/TIGER2023/CD/tl_2023_06_cd118.zip"
+        assembly_url = "https://www2.census.gov/geo/tiger/TIGER2023/SLDL/tl_2023_06_sldl.zip"
+        senate_url = "https://www2.census.gov/geo/tiger/TIGER2023/SLDU/tl_2023_06_sldu.zip"
+        
+        layers = await asyncio.gather(
+            self.get_district_layer(sf_url),
+            self.get_district_layer(marin_url),
+            self.get_tiger_layer(congressional_url, 'CD118FP'),
+            self.get_tiger_layer(assembly_url, 'SLDLST'),
+            self.get_tiger_layer(senate_url, 'SLDUST'),
+            return_exceptions=True
+        )
+        
+        for name, layer in zip(['SF', 'Marin', 'Congressional', 'Assembly', 'Senate'], layers):
+            if isinstance(layer, Exception):
+                logger.warning(f"{name} District layer error: {layer}")
+        
+        (
+            self.sf_districts,
+            self.marin_districts,
+            self.congressional_districts,
+            self.assembly_districts,
+            self.senate_districts
+        ) = [None if isinstance(layer, Exception) else layer for layer in layers]
+    
+    def find_districts(self, layer, located):
+        """Find the district containing each record's coordinates in one spatial join."""
+        points = gpd.GeoDataFrame(
+            index=located.index,
+            geometry=gpd.points_from_xy(pd.to_numeric(located['Longitude']), pd.to_numeric(located['Latitude'])),
+            crs='EPSG:4326'
+        )
+        
+        joined = gpd.sjoin(points, layer[['DISTRICT', 'geometry']], how='left', predicate='intersects')
+        
+        # A point on a shared boundary matches both districts; keep the first
+        return joined.loc[~joined.index.duplicated(), 'DISTRICT']
+    
+    def get_layer_districts(self, located, cities):
+        """Get Supervisor, Congressional, Assembly, and Senate districts from the local layers."""
+        districts = {}
+        
+        for col, name, layer, records in [
+            ('SF_Supervisorial_District', 'SF', self.sf_districts, located[cities == 'san francisco']),
+            ('Marin_Supervisor_District', 'Marin', self.marin_districts, located[cities.isin(self.MARIN_CITIES)]),
+            ('Congressional_District', 'Congressional', self.congressional_districts, located),
+            ('CA_Assembly_District', 'Assembly', self.assembly_districts, located),
+            ('CA_Senate_District', 'Senate', self.senate_districts, located)
+        ]:
+            if records.empty:
+                continue
             
-        except Exception as e:
-            logger.warning(f"Marin District lookup error: {e}")
-            return {'district': 'Error'}
+            try:
+                districts[col] = self.find_districts(layer, records)
+            except Exception as e:
+                logger.warning(f"{name} District lookup error: {e}")
+                districts[col] = pd.Series('Error', index=records.index)
+        
+        return districts
     
-    def get_census_data(self, lat, lon):
+    async def get_census_data(self, lat, lon):
         """Get Census PUMA, Census Tract, and Census Block."""
         try:
-            time.sleep(self.api_delay)
-            
             # Use Census Geocoding API
             url = "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
             
@@ -186,10 +373,7 @@ class DistrictLookup:
                 'format': 'json'
             }
             
-            response = self.session.get(url, params=params, timeout=20)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._get_json(url, params, timeout=20)
             
             if 'result' in data and 'geographies' in data['result']:
                 geographies = data['result']['geographies']
@@ -229,136 +413,428 @@ class DistrictLookup:
             logger.warning(f"Census data lookup error: {e}")
             return {'puma': 'Error', 'tract': 'Error', 'block': 'Error'}
     
-    def get_political_districts(self, lat, lon):
-        """Get Congressional, Assembly, and Senate districts."""
-        try:
-            time.sleep(self.api_delay)
-            
-            # Use FCC API for political districts
-            url = "https://geo.fcc.gov/api/census/area"
-            
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'format': 'json'
-            }
-            
-            response = self.session.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'results' in data and data['results']:
-                result = data['results'][0]
-                
-                return {
-                    'congressional': result.get('congress_district', None),
-                    'assembly': result.get('state_lower_district', None),
-                    'senate': result.get('state_upper_district', None)
+    async def get_tract_to_puma(self):
+        """Get the California Census Tract to PUMA mapping."""
+        cache_key = ('tract_to_puma',)
+        tract_to_puma = self.cache.get(cache_key)
+        if tract_to_puma is not None:
+            return tract_to_puma
+        
+        # 2020 Census Tract to 2020 PUMA relationship file
+        url = "https://www2.census.gov/geo/docs/maps-data/data/rel2020/2020_Census_Tract_to_2020_PUMA.txt"
+        
+        response = await self._request('GET', url, timeout=60)
+        text = response.content.decode('utf-8-sig')
+        
+        relationships = pd.read_csv(io.StringIO(text), dtype=str)
+        relationships = relationships[relationships['STATEFP'] == '06']
+        tract_to_puma = dict(zip(
+            zip(relationships['COUNTYFP'], relationships['TRACTCE']),
+            relationships['PUMA5CE']
+        ))
+        
+        self.cache.set(cache_key, tract_to_puma, expire=365 * 86400)
+        return tract_to_puma
+    
+    async def get_census_batch(self, addresses):
+        """Get Census PUMA, Census Tract, and Census Block for a batch of addresses.
+        
+        Yields the ids sent in each request with the census data for those matched,
+        so callers can keep each request's results before the next one is sent.
+        """
+        # Census batch geocoder, up to 10,000 addresses per request
+        url = "https://geocoding.geo.census.gov/geocoder/geographies/addressbatch"
+        batch_size = 10000
+        columns = [
+            'id', 'input_address', 'match', 'match_type', 'matched_address',
+            'coordinates', 'tiger_line_id', 'side', 'state', 'county', 'tract', 'block'
+        ]
+        
+        tract_to_puma = await self.get_tract_to_puma()
+        
+        ids = list(addresses)
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for record_id in batch_ids:
+                address, city, zip_code = addresses[record_id]
+                writer.writerow([record_id, address, city, 'CA', zip_code])
+            
+            # A failed request loses only its own addresses
+            try:
+                response = await self._request(
+                    'POST', url,
+                    data={'benchmark': 'Public_AR_Current', 'vintage': 'Current_Current'},
+                    files={'addressFile': ('addrs.csv', buffer.getvalue(), 'text/csv')},
+                    timeout=600
+                )
+            except Exception as e:
+                logger.warning(f"Census batch lookup error for {len(batch_ids)} addresses: {e}")
+                continue
+            text = response.text
+            
+            batch = pd.read_csv(io.StringIO(text), header=None, names=columns, dtype=str)
+            matched = batch[(batch['match'] == 'Match') & batch['tract'].notna()]
+            
+            # Maps record id to census data for matched addresses
+            results = {}
+            for row in matched.itertuples(index=False):
+                results[row.id] = {
+                    'puma': tract_to_puma.get((row.county, row.tract)),
+                    'tract': row.tract,
+                    'block': row.block
                 }
             
-            return {'congressional': None, 'assembly': None, 'senate': None}
-            
+            yield batch_ids, results
+    
+    async def batch_census_addresses(self, cache_keys):
+        """Batch-look up the addresses not yet cached or tried, caching each match.
+        
+        cache_keys maps each (address, city, zip) key to its normalized cache key.
+        """
+        uncached = {}
+        for key, cache_key in cache_keys.items():
+            if key not in self.census_batched and self.cache.get(cache_key) is None:
+                uncached[str(len(uncached))] = key
+        
+        if not uncached:
+            return
+        
+        logger.info(f"Batch Census lookup for {len(uncached)} unique addresses...")
+        try:
+            async for batch_ids, results in self.get_census_batch(uncached):
+                for record_id, census_data in results.items():
+                    self.cache.set(cache_keys[uncached[record_id]], census_data, expire=self.cache_expire)
+                
+                # Addresses the batch could not match go to point lookups, not another batch
+                self.census_batched.update(uncached[record_id] for record_id in batch_ids)
         except Exception as e:
-            logger.warning(f"Political districts lookup error: {e}")
-            return {'congressional': 'Error', 'assembly': 'Error', 'senate': 'Error'}
-
-    def process_records(self):
-        """Process all records in the DataFrame."""
-        if self.df is None:
-            logger.error("No data loaded. Please run load_data() first.")
-            return False
+            logger.warning(f"Census batch lookup error: {e}")
+    
+    async def lookup_census_batch(self, located):
+        """Fill Census columns by address in bulk and return the index of records filled."""
+        groups = located.groupby(['Person Address', 'Person city', 'Person Zip Code']).indices
+        cache_keys = {key: self.census_keys[key] for key in groups}
         
-        total_records = len(self.df)
-        processed = 0
+        # Normally all served from the batch run up front in process_records
+        await self.batch_census_addresses(cache_keys)
+        
+        filled = []
+        for key, positions in groups.items():
+            census_data = self.cache.get(cache_keys[key])
+            if census_data is None:
+                continue
+            
+            index_list = located.index[positions]
+            self.add_results(index_list, {
+                'Census_PUMA': census_data['puma'],
+                'Census_Tract': census_data['tract'],
+                'Census_Block': census_data['block']
+            })
+            filled.extend(index_list)
+        
+        return pd.Index(filled)
+    
+    def add_results(self, index_list, values):
+        """Queue column values for every record in index_list."""
+        self.results.extend({'idx': index, **values} for index in index_list)
+    
+    def add_column_results(self, column, values):
+        """Queue one column's values from a Series indexed by record."""
+        self.results.extend({'idx': index, column: value} for index, value in values.items())
+    
+    def apply_results(self):
+        """Write queued results to the DataFrame in one block."""
+        if not self.results:
+            return
         
-        logger.info(f"Starting to process {total_records} records...")
+        # Later results for a record fill in the columns earlier ones left out
+        updates = pd.DataFrame(self.results, dtype=object).set_index('idx')
+        updates = updates.groupby(level=0).last()
+        for col in updates.columns.intersection(['Latitude', 'Longitude']):
+            updates[col] = pd.to_numeric(updates[col])
+        self.df.update(updates)
+        self.results = []
         
-        for index, row in self.df.iterrows():
+        self.save_progress(updates)
+    
+    async def geocode_group(self, index_list, address, city, zip_code):
+        """Geocode one unique address and copy the result to every record at it."""
+        async with self.record_semaphore:
             try:
-                logger.info(f"Processing record {index + 1}/{total_records}")
+                if any(pd.isna(value) or value == '' for value in (address, city, zip_code)):
+                    logger.warning(f"Missing address data for {len(index_list)} record(s)")
+                    self.add_results(index_list, {'Geocoding_Status': 'Missing Address Data'})
+                    return
+                
+                geocode_result = await self.geocode_address(address, city, zip_code)
                 
-                # Skip if has coordinates
-                if pd.notna(row.get('Latitude')) and pd.notna(row.get('Longitude')):
-                    logger.info(f"Record {index + 1} already has coordinates, skipping geocoding")
-                    lat, lon = row['Latitude'], row['Longitude']
+                if geocode_result['status'] == 'Success':
+                    self.add_results(index_list, {
+                        'Latitude': geocode_result['latitude'],
+                        'Longitude': geocode_result['longitude'],
+                        'Geocoded_Address': geocode_result['formatted_address'],
+                        'Geocoding_Status': 'Success'
+                    })
                 else:
-                    # Geocode address
-                    address = row.get('Person Address', '')
-                    city = row.get('Person city', '')
-                    zip_code = row.get('Person Zip Code', '')
-                    
-                    if not all([address, city, zip_code]):
-                        logger.warning(f"Missing address data for record {index + 1}")
-                        self.df.at[index, 'Geocoding_Status'] = 'Missing Address Data'
-                        continue
+                    self.add_results(index_list, {'Geocoding_Status': geocode_result['status']})
+                    logger.warning(f"Geocoding failed for {address}, {city}: {geocode_result['status']}")
                     
-                    geocode_result = self.geocode_address(address, city, zip_code)
-                    
-                    if geocode_result['status'] == 'Success':
-                        lat = geocode_result['latitude']
-                        lon = geocode_result['longitude']
-                        
-                        self.df.at[index, 'Latitude'] = lat
-                        self.df.at[index, 'Longitude'] = lon
-                        self.df.at[index, 'Geocoded_Address'] = geocode_result['formatted_address']
-                        self.df.at[index, 'Geocoding_Status'] = 'Success'
-                    else:
-                        self.df.at[index, 'Geocoding_Status'] = geocode_result['status']
-                        logger.warning(f"Geocoding failed for record {index + 1}: {geocode_result['status']}")
-                        continue
-                
-                # Get SF Sups District
-                if 'san francisco' in str(city).lower():
-                    sf_district = self.get_sf_supervisorial_district(lat, lon)
-                    self.df.at[index, 'SF_Supervisorial_District'] = sf_district['district']
-                    self.df.at[index, 'SF_Supervisor'] = sf_district['supervisor']
-                
-                # Get Marin County Sups District
-                if any(marin_city in str(city).lower() for marin_city in ['san rafael', 'novato', 'mill valley', 'tiburon', 'sausalito', 'corte madera', 'larkspur', 'fairfax', 'san anselmo', 'ross', 'kentfield', 'belvedere']):
-                    marin_district = self.get_marin_supervisor_district(lat, lon)
-                    self.df.at[index, 'Marin_Supervisor_District'] = marin_district['district']
-                    self.df.at[index, 'Marin_Supervisor'] = marin_district['supervisor']
-                
-                # Get Census data
-                census_data = self.get_census_data(lat, lon)
-                self.df.at[index, 'Census_PUMA'] = census_data['puma']
-                self.df.at[index, 'Census_Tract'] = census_data['tract']
-                self.df.at[index, 'Census_Block'] = census_data['block']
-                
-                # Get Political districts
-                political_districts = self.get_political_districts(lat, lon)
-                self.df.at[index, 'Congressional_District'] = political_districts['congressional']
-                self.df.at[index, 'CA_Assembly_District'] = political_districts['assembly']
-                self.df.at[index, 'CA_Senate_District'] = political_districts['senate']
-                
-                # Update timestamp
-                self.df.at[index, 'Last_Updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                processed += 1
+            except Exception as e:
+                logger.error(f"Error geocoding {address}, {city}: {e}")
+                self.add_results(index_list, {'Geocoding_Status': f'Processing Error: {str(e)}'})
+
+    async def lookup_census_point(self, index_list, lat, lon):
+        """Fetch Census data for one location the batch lookup did not match."""
+        async with self.record_semaphore:
+            try:
+                census_data = await self.get_census_data(lat, lon)
                 
-                # Save progress every 10 records
-                if processed % 10 == 0:
-                    self.save_progress()
-                    logger.info(f"Progress saved. Processed {processed}/{total_records} records")
+                self.add_results(index_list, {
+                    'Census_PUMA': census_data['puma'],
+                    'Census_Tract': census_data['tract'],
+                    'Census_Block': census_data['block']
+                })
                 
             except Exception as e:
-                logger.error(f"Error processing record {index + 1}: {e}")
-                self.df.at[index, 'Geocoding_Status'] = f'Processing Error: {str(e)}'
-                continue
+                logger.error(f"Error looking up Census data at {lat}, {lon}: {e}")
+                self.add_results(index_list, {'Geocoding_Status': f'Processing Error: {str(e)}'})
+
+    async def process_chunk(self, chunk):
+        """Geocode and look up districts for one chunk of records."""
+        # Geocode each unique address once; records with coordinates skip this
+        pending = chunk[chunk['Latitude'].isna() | chunk['Longitude'].isna()]
+        logger.info(f"{len(chunk) - len(pending)} records already have coordinates, skipping geocoding")
+        
+        groups = pending.groupby(['Person Address', 'Person city', 'Person Zip Code'], dropna=False).indices
+        logger.info(f"Geocoding {len(groups)} unique addresses...")
+        await asyncio.gather(*(
+            self.geocode_group(pending.index[positions], address, city, zip_code)
+            for (address, city, zip_code), positions in groups.items()
+        ))
+        self.apply_results()
+        
+        # Look up districts once per unique location. Census blocks are
+        # ~100 m, so 5 decimals (~1 m) also keeps cache keys stable.
+        chunk = self.df.loc[chunk.index]
+        located = chunk[chunk['Latitude'].notna() & chunk['Longitude'].notna()]
+        
+        # Don't spend lookups on coordinates outside California
+        in_bounds = (
+            pd.to_numeric(located['Latitude']).between(*self.CA_LAT_RANGE)
+            & pd.to_numeric(located['Longitude']).between(*self.CA_LON_RANGE)
+        )
+        if not in_bounds.all():
+            logger.warning(f"{(~in_bounds).sum()} records have coordinates outside California, skipping districts")
+            self.add_results(located.index[~in_bounds], {'Geocoding_Status': 'Invalid Coords'})
+            located = located[in_bounds]
+        
+        keys = pd.DataFrame({
+            'lat': pd.to_numeric(located['Latitude']).round(5),
+            'lon': pd.to_numeric(located['Longitude']).round(5)
+        }, index=located.index)
+        
+        # Clear failures left by an earlier run; update() can't overwrite a cell with a missing value
+        stale = self.df.loc[located.index, self.LOOKUP_COLUMNS]
+        self.df.loc[located.index, self.LOOKUP_COLUMNS] = stale.mask(stale == 'Error')
+        
+        # Districts for all records in one spatial join per layer,
+        # run in a worker thread to keep the event loop free
+        cities = located['Person city'].astype(str).str.strip().str.lower()
+        layer_districts = await asyncio.to_thread(self.get_layer_districts, located, cities)
+        for col, districts in layer_districts.items():
+            self.add_column_results(col, districts)
+        
+        census_filled = await self.lookup_census_batch(located)
+        
+        # Census point lookups, once per location the batch did not match
+        unmatched = keys.loc[located.index.difference(census_filled)]
+        groups = unmatched.groupby(['lat', 'lon']).indices
+        logger.info(f"Looking up Census data for {len(groups)} unmatched locations...")
+        await asyncio.gather(*(
+            self.lookup_census_point(unmatched.index[positions], lat, lon)
+            for (lat, lon), positions in groups.items()
+        ))
+        
+        # Flush the chunk to the checkpoint so memory stays bounded
+        self.apply_results()
+        
+        # Records with a failed lookup stay unstamped, so a resumed run retries them
+        located = self.df.loc[located.index]
+        failed = (
+            (located[self.LOOKUP_COLUMNS] == 'Error').any(axis=1)
+            | located['Geocoding_Status'].astype(str).str.startswith('Processing Error')
+        )
+        if failed.any():
+            logger.warning(f"{failed.sum()} records had lookup errors and will be retried on the next run")
+            self.add_results(located.index[failed], {'Geocoding_Status': 'Lookup Error'})
+        
+        # Clear the status left by a failed lookup in an earlier run
+        recovered = ~failed & (located['Geocoding_Status'] == 'Lookup Error')
+        self.add_results(located.index[recovered], {'Geocoding_Status': 'Success'})
+        
+        # One timestamp for the whole chunk; Excel can't store timezone-aware values
+        self.add_results(located.index[~failed], {'Last_Updated': pd.Timestamp.now().floor('s')})
+        self.processed += (~failed).sum()
+        self.apply_results()
+
+    async def process_records(self):
+        """Process all records in the DataFrame."""
+        if self.df is None:
+            logger.error("No data loaded. Please run load_data() first.")
+            return False
+        
+        total_records = len(self.df)
+        self.processed = 0
+        self.results = []
+        self.record_semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # Records finished by an interrupted run are not redone
+        remaining = self.df.index.difference(self.completed)
+        if len(self.completed):
+            logger.info(f"{total_records - len(remaining)} records already processed by a previous run")
+        
+        chunks = [remaining[start:start + self.chunk_size] for start in range(0, len(remaining), self.chunk_size)]
+        
+        logger.info(f"Starting to process {len(remaining)} records in {len(chunks)} chunks...")
+        
+        # One client for the whole run; HTTP/2 multiplexes requests to the same host
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=15.0
+        )
+        try:
+            await self.load_district_layers()
+            
+            # One Census batch pass over every remaining address, so requests fill
+            # to the batch geocoder's 10,000 rather than chunk_size
+            address_columns = ['Person Address', 'Person city', 'Person Zip Code']
+            pending = self.df.loc[remaining]
+            self.census_keys = {
+                key: census_cache_key(key)
+                for key in pending[address_columns].dropna().drop_duplicates().itertuples(index=False, name=None)
+            }
+            
+            # Skip records an earlier run found unlocatable or outside California
+            has_coords = pending['Latitude'].notna() & pending['Longitude'].notna()
+            in_bounds = (
+                pd.to_numeric(pending['Latitude']).between(*self.CA_LAT_RANGE)
+                & pd.to_numeric(pending['Longitude']).between(*self.CA_LON_RANGE)
+            )
+            eligible = pending[
+                (pending['Geocoding_Status'].isna() | pending['Geocoding_Status'].isin(['Success', 'Lookup Error']))
+                & (~has_coords | in_bounds)
+            ]
+            await self.batch_census_addresses({
+                key: self.census_keys[key]
+                for key in eligible[address_columns].dropna().drop_duplicates().itertuples(index=False, name=None)
+            })
+            
+            for number, chunk_index in enumerate(chunks, 1):
+                logger.info(f"Processing chunk {number}/{len(chunks)}")
+                await self.process_chunk(self.df.loc[chunk_index])
+                logger.info(f"Progress saved. Processed {self.processed}/{len(remaining)} records")
+        finally:
+            await self.aclose()
+        
+        self.optimize_dtypes()
         
-        logger.info(f"Completed. Successfully processed {processed}/{total_records} records")
+        logger.info(f"Completed. Successfully processed {self.processed}/{len(remaining)} records")
         return True
     
-    def save_progress(self):
-        """Save progress to temp file."""
+    def optimize_dtypes(self):
+        """Store district numbers as small nullable integers and Census codes as strings."""
+        try:
+            # 'Error' and 'Unknown' become missing values
+            for col in [
+                'SF_Supervisorial_District', 'Marin_Supervisor_District',
+                'Congressional_District', 'CA_Assembly_District', 'CA_Senate_District'
+            ]:
+                self.df[col] = pd.to_numeric(self.df[col], errors='coerce').astype('Int8')
+            
+            # Census codes keep their leading zeros
+            for col in ['Census_PUMA', 'Census_Tract', 'Census_Block']:
+                self.df[col] = self.df[col].astype('string[pyarrow]')
+            
+            # Exports as an Excel date rather than text
+            self.df['Last_Updated'] = pd.to_datetime(self.df['Last_Updated'], errors='coerce', format='mixed')
+        except Exception as e:
+            logger.warning(f"Error optimizing column types: {e}")
+    
+    async def aclose(self):
+        """Close the HTTP client."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+    
+    def save_progress(self, updates):
+        """Append newly processed records to the checkpoint."""
         try:
-            temp_filename = f"temp_geocode_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            self.df.to_excel(temp_filename, index=False)
-            logger.info(f"Progress saved to {temp_filename}")
+            # Every part shares one schema so the checkpoint reads back as one table
+            schema = pa.schema([
+                ('idx', pa.int64()),
+                ('Latitude', pa.float64()),
+                ('Longitude', pa.float64()),
+                ('Last_Updated', pa.timestamp('us'))
+            ] + [(col, pa.string()) for col in self.TEXT_COLUMNS])
+            
+            updates = updates.reindex(columns=self.GEO_COLUMNS)
+            updates['Last_Updated'] = pd.to_datetime(updates['Last_Updated'])
+            updates[self.TEXT_COLUMNS] = updates[self.TEXT_COLUMNS].astype('string')
+            updates = updates.rename_axis('idx').reset_index()
+            
+            table = pa.Table.from_pandas(updates, schema=schema, preserve_index=False)
+            
+            # Tie the checkpoint to this input so a different file can't reuse its rows
+            if not os.path.exists(self.fingerprint_path):
+                os.makedirs(self.checkpoint_path, exist_ok=True)
+                with open(self.fingerprint_path, 'w') as f:
+                    f.write(self.fingerprint)
+            
+            # Part names sort in write order, so later parts win on reload
+            pq.write_to_dataset(
+                table, self.checkpoint_path,
+                basename_template=f"part-{time.time_ns()}-{{i}}.parquet"
+            )
+            logger.info(f"Progress saved to {self.checkpoint_path}")
         except Exception as e:
             logger.error(f"Error saving progress: {e}")
     
+    def load_progress(self):
+        """Restore records saved by an interrupted run."""
+        self.completed = pd.Index([])
+        if not os.path.exists(self.checkpoint_path):
+            return
+        
+        try:
+            # Rows are matched by position, so only the exact input the checkpoint was made from can use it
+            fingerprint = None
+            if os.path.exists(self.fingerprint_path):
+                with open(self.fingerprint_path) as f:
+                    fingerprint = f.read().strip()
+            if fingerprint != self.fingerprint:
+                logger.warning(f"{self.checkpoint_path} was made from a different input file, discarding it")
+                self.clear_progress()
+                return
+            
+            checkpoint = pq.read_table(self.checkpoint_path).to_pandas()
+            checkpoint = checkpoint.set_index('idx').groupby(level=0).last()
+            checkpoint = checkpoint[checkpoint.index.isin(self.df.index)]
+            
+            checkpoint[self.TEXT_COLUMNS] = checkpoint[self.TEXT_COLUMNS].astype(object)
+            self.df.update(checkpoint)
+            self.completed = checkpoint.index[checkpoint['Last_Updated'].notna()]
+            logger.info(f"Restored {len(checkpoint)} records from {self.checkpoint_path}")
+        except Exception as e:
+            logger.error(f"Error loading progress: {e}")
+    
+    def clear_progress(self):
+        """Remove the checkpoint once results are exported."""
+        if os.path.exists(self.checkpoint_path):
+            shutil.rmtree(self.checkpoint_path)
+    
     def export_results(self, output_filename=None):
         """Export to Excel."""
         if output_filename is None:
@@ -366,8 +842,9 @@ class DistrictLookup:
             output_filename = f"Geocoded_ActiveParticipants_{timestamp}.xlsx"
         
         try:
-            self.df.to_excel(output_filename, index=False)
+            self.df.to_excel(output_filename, index=False, engine='xlsxwriter')
             logger.info(f"Results exported to {output_filename}")
+            self.clear_progress()
             return output_filename
         except Exception as e:
             logger.error(f"Error exporting: {e}")
@@ -388,7 +865,7 @@ def main():
         return
     
     # Process records
-    if not lookup.process_records():
+    if not asyncio.run(lookup.process_records()):
         logger.error("Failed to process records.")
         return
     